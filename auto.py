@@ -6,12 +6,14 @@ from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
+from PIL import Image, ImageChops, ImageDraw, ImageFont
 import time
 import logging
 import requests
 import json
 import re
 import os
+import hashlib
 
 # Configure logging
 logging.basicConfig(
@@ -21,31 +23,108 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Separator band drawn above each result when several are stitched into one OCR request
+BATCH_MARKER_RE = re.compile(r"RESULT\s*MARKER\s*[:#]?\s*(\d+)", re.IGNORECASE)
+# A misread marker left inside a record means the next result was folded into it
+BATCH_MARKER_RESIDUE_RE = re.compile(r"RESULT\s*MAR\w*", re.IGNORECASE)
+BATCH_BAND_HEIGHT = 90
+BATCH_MARKER_FONT_SIZE = 40
+# OCR.space free tier rejects uploads above 1 MB; larger stitched sheets are split before sending
+OCR_MAX_BYTES = 1024 * 1024
+BATCH_JPEG_QUALITY = 85
+# Pixels kept above the first result table so the NAME / ROLL NO header is not cropped away
+RESULT_HEADER_MARGIN = 250
+
+def fingerprint_path(output_file: str) -> str:
+    """Return the fingerprint side-file used for an output file."""
+    return os.path.splitext(output_file)[0] + ".fingerprints.json"
+
+def setup_driver() -> webdriver.Chrome:
+    """Configure and return a Chrome WebDriver instance."""
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+
+    try:
+        service = Service(ChromeDriverManager().install())
+        return webdriver.Chrome(service=service, options=chrome_options)
+    except Exception as e:
+        logger.error(f"Failed to set up WebDriver: {str(e)}")
+        return None
+
+def load_exam_select(driver: webdriver.Chrome) -> Select:
+    """Load the results page and return the exam dropdown."""
+    logger.info("Loading results page...")
+    driver.get("https://result.tuexam.edu.np/")
+    WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+    time.sleep(2)
+
+    # Get all exam options
+    return Select(WebDriverWait(driver, 15).until(
+        EC.presence_of_element_located((By.TAG_NAME, "select"))
+    ))
+
+def choose_exam(exam_select: Select):
+    """List the BSC exams and return the option value the user selects."""
+    # Filter and display BSC exams
+    bsc_options = []
+    logger.info("\nAvailable BSC Exams:")
+    for i, option in enumerate([opt for opt in exam_select.options if "BSC" in opt.text], 1):
+        bsc_options.append((i, option.get_attribute('value'), option.text))
+        logger.info(f"{i}. {option.text}")
+
+    if not bsc_options:
+        logger.warning("No BSC exams found!")
+        return None
+
+    # Get user selection
+    while True:
+        try:
+            selection = int(input("\nEnter the number of the exam you want to select: "))
+            if 1 <= selection <= len(bsc_options):
+                logger.info(f"Selected exam: {bsc_options[selection-1][2]}")
+                return bsc_options[selection-1][1]
+            print(f"Please enter a number between 1 and {len(bsc_options)}")
+        except ValueError:
+            print("Please enter a valid number.")
+
 class TUExamScraper:
-    def __init__(self):
-        self.output_file = "ocr_results.txt"
+    def __init__(self, batch_size: int = 1, recrawl: bool = False, output_file: str = "ocr_results.txt",
+                 driver: webdriver.Chrome = None):
+        # output_file=None leaves files alone, for subclasses that keep results elsewhere
+        self.output_file = output_file
+        self.fingerprint_file = fingerprint_path(output_file) if output_file else None
+        self.batch_size = max(1, batch_size)
+        self.pending = []
+        self.recrawl = recrawl
+        self.changed = []
+        self.added = []
+        self.unchanged = 0
+        self.last_error = None
         
-        # Clear the output file at the start
-        if os.path.exists(self.output_file):
-            os.remove(self.output_file)
-        logger.info(f"Existing file '{self.output_file}' has been cleared.")
-        self.driver = self._setup_driver()
+        if not output_file:
+            self.fingerprints = {}
+        elif recrawl:
+            # Keep the previous results and only rewrite the symbols whose page changed
+            self.fingerprints = self._load_fingerprints()
+            logger.info(f"Re-crawling against {len(self.fingerprints)} stored fingerprints.")
+        else:
+            # Clear the output file at the start
+            for path in (self.output_file, self.fingerprint_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.fingerprints = {}
+            logger.info(f"Existing file '{self.output_file}' has been cleared.")
+        # A driver passed in belongs to the caller and is not quit at the end of run()
+        self.owns_driver = driver is None
+        self.driver = driver if driver else self._setup_driver()
 
     def _setup_driver(self) -> webdriver.Chrome:
         """Configure and return a Chrome WebDriver instance."""
-        chrome_options = Options()
-        chrome_options.add_argument("--headless=new")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-        
-        try:
-            service = Service(ChromeDriverManager().install())
-            return webdriver.Chrome(service=service, options=chrome_options)
-        except Exception as e:
-            logger.error(f"Failed to set up WebDriver: {str(e)}")
-            return None
+        return setup_driver()
 
     def take_screenshot(self, name: str, symbol_number: str) -> str:
         """Take a single screenshot and return the filename."""
@@ -101,14 +180,215 @@ class TUExamScraper:
             
         try:
             with open(self.output_file, "a") as f:
-                f.write("="*40 + "\n")
-                f.write(f"Results for Symbol Number: {symbol_number}\n")
-                f.write("="*40 + "\n")
-                f.write(ocr_text + "\n\n")
+                f.write(self._format_record(symbol_number, ocr_text))
             logger.info(f"Results for symbol number {symbol_number} saved to {self.output_file}")
         except Exception as e:
             logger.error(f"Failed to write to file: {str(e)}")
     
+    def _format_record(self, symbol_number: str, ocr_text: str) -> str:
+        """Return the output file block for one symbol number."""
+        return ("="*40 + "\n"
+                + f"Results for Symbol Number: {symbol_number}\n"
+                + "="*40 + "\n"
+                + ocr_text + "\n\n")
+    
+    def _replace_in_file(self, symbol_number: str, ocr_text: str):
+        """Replace a stored record in place if its text differs; return the old text, or None if absent."""
+        if not os.path.exists(self.output_file):
+            return None
+            
+        try:
+            # newline="" keeps the \r\n line endings OCR.space returns, so unchanged text compares equal
+            with open(self.output_file, "r", newline="") as f:
+                content = f.read()
+            block = re.compile(
+                r"^={40}\nResults for Symbol Number: " + re.escape(symbol_number) + r"\n={40}\n"
+                r"(.*?)(?=^={40}\nResults for Symbol Number:|\Z)",
+                re.MULTILINE | re.DOTALL
+            )
+            match = block.search(content)
+            if not match:
+                return None
+            old_text = match.group(1).rstrip()
+            if old_text == ocr_text.rstrip():
+                return old_text
+            
+            # Rewrite through a temporary file so an interruption cannot truncate the results
+            content = content[:match.start()] + self._format_record(symbol_number, ocr_text) + content[match.end():]
+            tmp_path = self.output_file + ".tmp"
+            with open(tmp_path, "w", newline="") as f:
+                f.write(content)
+            os.replace(tmp_path, self.output_file)
+            return old_text
+        except Exception as e:
+            logger.error(f"Failed to replace old record for {symbol_number}: {str(e)}")
+            return None
+    
+    def _load_fingerprints(self) -> dict:
+        """Load the stored page fingerprints, keyed by symbol number."""
+        try:
+            with open(self.fingerprint_file, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Failed to read fingerprints: {str(e)}")
+            return {}
+    
+    def _save_fingerprints(self):
+        """Persist the page fingerprints next to the output file."""
+        if not self.fingerprint_file:
+            return
+        try:
+            tmp_path = self.fingerprint_file + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.fingerprints, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.fingerprint_file)
+        except Exception as e:
+            logger.error(f"Failed to save fingerprints: {str(e)}")
+    
+    def _page_fingerprint(self):
+        """Hash the text of the displayed result so unchanged results can be skipped on re-crawls."""
+        try:
+            tables = self.driver.find_elements(By.TAG_NAME, "table")
+            if tables:
+                text = "\n".join(table.text for table in tables)
+            else:
+                text = self.driver.find_element(By.TAG_NAME, "body").text
+            normalized = " ".join(text.split())
+            return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        except Exception as e:
+            logger.warning(f"Could not fingerprint result page: {str(e)}")
+            return None
+    
+    def _save_result(self, symbol_number: str, ocr_text: str, fingerprint: str = None):
+        """Write and display the OCR text for one symbol number."""
+        if not ocr_text:
+            return
+            
+        if fingerprint:
+            self.fingerprints[symbol_number] = fingerprint
+        
+        if self.recrawl:
+            # Records written without a fingerprint are compared by text, not duplicated
+            old_text = self._replace_in_file(symbol_number, ocr_text)
+            if old_text is None:
+                self._write_to_file(symbol_number, ocr_text)
+                self.added.append(symbol_number)
+            elif old_text == ocr_text.rstrip():
+                self.unchanged += 1
+                return
+            else:
+                self.changed.append(symbol_number)
+        else:
+            self._write_to_file(symbol_number, ocr_text)
+        self.parse_marksheet(ocr_text)
+    
+    def _result_region(self):
+        """Return the page box (left, top, right, bottom) around the result tables, or None."""
+        try:
+            tables = self.driver.find_elements(By.TAG_NAME, "table")
+            if not tables:
+                return None
+            rects = [table.rect for table in tables]
+            return (
+                0,
+                max(0, int(min(r["y"] for r in rects)) - RESULT_HEADER_MARGIN),
+                int(max(r["x"] + r["width"] for r in rects)),
+                int(max(r["y"] + r["height"] for r in rects)),
+            )
+        except Exception as e:
+            logger.warning(f"Could not locate result table: {str(e)}")
+            return None
+    
+    def _crop_result(self, image_path: str, region) -> Image.Image:
+        """Crop a screenshot to the result region and trim the blank margins."""
+        image = Image.open(image_path).convert("RGB")
+        if region:
+            # The region is in page coordinates but the screenshot only covers the viewport
+            left, top, right, bottom = region
+            left, top = max(0, left), max(0, top)
+            right, bottom = min(right, image.width), min(bottom, image.height)
+            if right > left and bottom > top:
+                image = image.crop((left, top, right, bottom))
+        bbox = ImageChops.difference(image, Image.new("RGB", image.size, "white")).getbbox()
+        return image.crop(bbox) if bbox else image
+    
+    def stitch_screenshots(self, batch) -> str:
+        """Stack the cropped results of a batch into one image, each below a symbol marker band."""
+        crops = [self._crop_result(image_path, region) for _, image_path, region, _ in batch]
+        width = max(crop.width for crop in crops)
+        height = sum(crop.height + BATCH_BAND_HEIGHT for crop in crops)
+        font = ImageFont.load_default(size=BATCH_MARKER_FONT_SIZE)
+        
+        sheet = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(sheet)
+        y = 0
+        for (symbol_number, _, _, _), crop in zip(batch, crops):
+            draw.rectangle([0, y, width, y + 4], fill="black")
+            draw.text((20, y + 25), f"RESULT MARKER {symbol_number}", fill="black", font=font)
+            y += BATCH_BAND_HEIGHT
+            sheet.paste(crop, (0, y))
+            y += crop.height
+        
+        filename = f"batch_{batch[0][0]}_{batch[-1][0]}.jpg"
+        sheet.save(filename, "JPEG", quality=BATCH_JPEG_QUALITY)
+        logger.info(f"Stitched {len(batch)} results into {filename}")
+        return filename
+    
+    def split_batch_text(self, ocr_text: str, symbol_numbers) -> dict:
+        """Split stitched OCR text on the marker bands; return the records of the symbols recovered."""
+        parts = BATCH_MARKER_RE.split(ocr_text)
+        # parts = [preamble, symbol, text, symbol, text, ...]
+        return {symbol: text.strip() for symbol, text in zip(parts[1::2], parts[2::2])
+                if symbol in symbol_numbers and text.strip() and not BATCH_MARKER_RESIDUE_RE.search(text)}
+    
+    def _flush_batch(self):
+        """OCR every pending screenshot and save each symbol's text."""
+        batch, self.pending = self.pending, []
+        self._ocr_batch(batch)
+        if batch:
+            self._save_fingerprints()
+    
+    def _ocr_single(self, entry):
+        """OCR one queued screenshot on its own and save the text."""
+        symbol_number, image_path, _, fingerprint = entry
+        self._save_result(symbol_number, self.process_with_ocr(image_path), fingerprint)
+    
+    def _ocr_batch(self, batch):
+        """OCR a batch with one stitched request, then retry only the symbols whose marker was lost."""
+        if not batch:
+            return
+        if len(batch) == 1:
+            self._ocr_single(batch[0])
+            return
+        
+        sheet_path = self.stitch_screenshots(batch)
+        if os.path.getsize(sheet_path) > OCR_MAX_BYTES:
+            # Splitting an oversized sheet costs no request, so halve until it fits
+            logger.info(f"Stitched sheet {sheet_path} exceeds the OCR upload limit, splitting batch.")
+            middle = len(batch) // 2
+            self._ocr_batch(batch[:middle])
+            self._ocr_batch(batch[middle:])
+            return
+        
+        ocr_text = self.process_with_ocr(sheet_path)
+        records = self.split_batch_text(ocr_text, [entry[0] for entry in batch]) if ocr_text else {}
+        for symbol_number, _, _, fingerprint in batch:
+            if symbol_number in records:
+                self._save_result(symbol_number, records[symbol_number], fingerprint)
+        
+        missing = [entry for entry in batch if entry[0] not in records]
+        if not missing:
+            return
+        if not records:
+            logger.warning("No result markers recovered from batch, retrying one request per symbol.")
+            for entry in missing:
+                self._ocr_single(entry)
+            return
+        logger.warning(f"Markers for {len(missing)} of {len(batch)} symbols were lost, retrying those.")
+        self._ocr_batch(missing)
+    
     def parse_marksheet(self, text):
         """Parse and display structured data from OCR text"""
         data = {
@@ -163,48 +443,29 @@ class TUExamScraper:
         print(f"Obtained Marks: {data['obtained_marks']}")
         print(f"Result: {data['result']}")
     
-    def run(self, start_symbol, end_symbol):
+    def _should_stop(self) -> bool:
+        """Checked before each symbol; subclasses return True to end run() early."""
+        return False
+    
+    def run(self, start_symbol, end_symbol, exam_value: str = None):
         if not self.driver:
             return
             
+        selected_value = exam_value
+        self.last_error = None
         try:
             # We'll reload the page for each symbol number to ensure a clean state.
             for symbol_number in range(start_symbol, end_symbol + 1):
+                if self._should_stop():
+                    logger.warning(f"Stopping before symbol number {symbol_number}.")
+                    break
                 logger.info(f"Processing symbol number: {symbol_number}")
                 
-                logger.info("Loading results page...")
-                self.driver.get("https://result.tuexam.edu.np/")
-                WebDriverWait(self.driver, 20).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                time.sleep(2)
-
-                # Get all exam options
-                exam_select = Select(WebDriverWait(self.driver, 15).until(
-                    EC.presence_of_element_located((By.TAG_NAME, "select"))
-                ))
-                
-                # Filter and display BSC exams
-                bsc_options = []
-                if symbol_number == start_symbol:
-                    logger.info("\nAvailable BSC Exams:")
-                    for i, option in enumerate([opt for opt in exam_select.options if "BSC" in opt.text], 1):
-                        bsc_options.append((i, option.get_attribute('value'), option.text))
-                        logger.info(f"{i}. {option.text}")
-                    
-                    if not bsc_options:
-                        logger.warning("No BSC exams found!")
+                exam_select = load_exam_select(self.driver)
+                if selected_value is None:
+                    selected_value = choose_exam(exam_select)
+                    if selected_value is None:
                         return
-                    
-                    # Get user selection
-                    while True:
-                        try:
-                            selection = int(input("\nEnter the number of the exam you want to select: "))
-                            if 1 <= selection <= len(bsc_options):
-                                selected_value = bsc_options[selection-1][1]
-                                logger.info(f"Selected exam: {bsc_options[selection-1][2]}")
-                                break
-                            print(f"Please enter a number between 1 and {len(bsc_options)}")
-                        except ValueError:
-                            print("Please enter a valid number.")
                 
                 # Select the chosen exam
                 exam_select.select_by_value(selected_value)
@@ -247,28 +508,55 @@ class TUExamScraper:
                 )
                 search_button.click()
                 
-                # Wait for results and take screenshot
+                # Wait for results and skip the OCR entirely if the result is unchanged
                 time.sleep(5)
+                fingerprint = self._page_fingerprint()
+                if self.recrawl and fingerprint and self.fingerprints.get(str(symbol_number)) == fingerprint:
+                    logger.info(f"Result for symbol number {symbol_number} unchanged, skipping.")
+                    self.unchanged += 1
+                    continue
+                
                 screenshot_path = self.take_screenshot('result', str(symbol_number))
+                if not screenshot_path:
+                    continue
                 
-                # Process the screenshot with OCR and save to file
-                ocr_text = self.process_with_ocr(screenshot_path)
-                if ocr_text:
-                    self._write_to_file(str(symbol_number), ocr_text)
-                    self.parse_marksheet(ocr_text)
+                # Queue the screenshot; OCR runs once the batch is full
+                self.pending.append((str(symbol_number), screenshot_path,
+                                     self._result_region() if self.batch_size > 1 else None,
+                                     fingerprint))
+                if len(self.pending) >= self.batch_size:
+                    self._flush_batch()
+            
+            self._flush_batch()
+            
+            if self.recrawl:
+                logger.info(f"Re-crawl finished: {self.unchanged} unchanged, "
+                            f"{len(self.changed)} changed, {len(self.added)} new.")
+                for symbol_number in self.changed:
+                    logger.info(f"Changed result: {symbol_number}")
+                for symbol_number in self.added:
+                    logger.info(f"New result: {symbol_number}")
             
         except Exception as e:
+            self.last_error = e
             logger.error(f"An error occurred: {str(e)}")
         finally:
-            self.driver.quit()
-            logger.info("Browser closed.")
+            try:
+                # OCR whatever is still queued so an error does not lose earlier symbols
+                self._flush_batch()
+            finally:
+                if self.owns_driver:
+                    self.driver.quit()
+                    logger.info("Browser closed.")
 
 if __name__ == "__main__":
     try:
         start_symbol = int(input("Enter the starting symbol number: ").strip())
         end_symbol = int(input("Enter the ending symbol number: ").strip())
+        batch_size = int(input("Enter results per OCR request (1 = no batching): ").strip() or 1)
+        recrawl = input("Re-crawl and only update changed results? (y/N): ").strip().lower() == "y"
         
-        scraper = TUExamScraper()
+        scraper = TUExamScraper(batch_size, recrawl)
         scraper.run(start_symbol, end_symbol)
     except ValueError:
         logger.error("Invalid input. Please enter valid integer symbol numbers.")
@@ -0,0 +1,383 @@
+# crawl_coordinator.py
+"""Split a symbol range into leased shards so several scraper processes can share one crawl.
+
+The work queue is a SQLite file. Workers on other hosts can use it through a shared
+filesystem, as long as that filesystem supports POSIX locks. Lease expiry compares
+timestamps from each host's own clock, so every host must keep its clock synchronised
+(NTP); a host running ahead by more than a lease will take shards that are still live.
+
+    python crawl_coordinator.py init --start 1000 --end 5000
+    python crawl_coordinator.py worker --processes 4    (on every host)
+    python crawl_coordinator.py status
+    python crawl_coordinator.py merge
+"""
+from auto import TUExamScraper, choose_exam, fingerprint_path, load_exam_select, logger, setup_driver
+from contextlib import contextmanager
+import multiprocessing
+import threading
+import argparse
+import sqlite3
+import socket
+import json
+import time
+import os
+
+DEFAULT_DB = "crawl_queue.db"
+DEFAULT_SHARD_SIZE = 50
+DEFAULT_LEASE_SECONDS = 600
+# Seconds an idle worker waits before checking again for expired leases
+POLL_INTERVAL = 30
+# A shard that failed this many times is marked failed instead of being handed out again
+MAX_ATTEMPTS = 3
+# A worker stops after this many shards in a row fail without producing any result
+MAX_WORKER_FAILURES = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    start_symbol INTEGER NOT NULL,
+    end_symbol INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS results (
+    symbol_number INTEGER PRIMARY KEY,
+    shard_id INTEGER NOT NULL,
+    ocr_text TEXT NOT NULL,
+    fingerprint TEXT
+);
+"""
+
+class WorkQueue:
+    def __init__(self, db_path: str = DEFAULT_DB):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+        self.conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        """Hold the database write lock for the duration of the block."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        self.conn.close()
+
+    def get_meta(self, key: str):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def create_shards(self, start_symbol: int, end_symbol: int, shard_size: int, exam_value: str) -> int:
+        """Split start_symbol..end_symbol into pending shards; return how many were created."""
+        if shard_size <= 0:
+            raise ValueError("Shard size must be positive")
+        if start_symbol > end_symbol:
+            raise ValueError("Start symbol must not be after end symbol")
+        with self._transaction() as conn:
+            if conn.execute("SELECT COUNT(*) FROM shards").fetchone()[0]:
+                raise ValueError(f"'{self.db_path}' already holds a crawl")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('exam_value', ?)", (exam_value,))
+            shards = [(start, min(start + shard_size - 1, end_symbol))
+                      for start in range(start_symbol, end_symbol + 1, shard_size)]
+            conn.executemany("INSERT INTO shards (start_symbol, end_symbol) VALUES (?, ?)", shards)
+        return len(shards)
+
+    def claim(self, worker: str, lease_seconds: float):
+        """Lease the next pending or expired shard; return (id, start, end) or None."""
+        now = time.time()
+        with self._transaction() as conn:
+            # A worker that died holding its last allowed attempt never called release()
+            conn.execute(
+                "UPDATE shards SET status = 'failed', worker = NULL, lease_expires = NULL "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, MAX_ATTEMPTS)
+            )
+            row = conn.execute(
+                "SELECT id, start_symbol, end_symbol FROM shards "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE shards SET status = 'leased', worker = ?, lease_expires = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    (worker, now + lease_seconds, row[0])
+                )
+        return row
+
+    def heartbeat(self, shard_id: int, worker: str, lease_seconds: float) -> bool:
+        """Extend a lease; return False if the shard was reassigned to another worker."""
+        cursor = self.conn.execute(
+            "UPDATE shards SET lease_expires = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + lease_seconds, shard_id, worker)
+        )
+        return cursor.rowcount == 1
+
+    def _store_results(self, conn, shard_id: int, worker: str, results) -> bool:
+        """Insert (symbol, ocr_text, fingerprint) rows if worker still holds the shard."""
+        owner = conn.execute(
+            "SELECT worker FROM shards WHERE id = ? AND status = 'leased'", (shard_id,)
+        ).fetchone()
+        if not owner or owner[0] != worker:
+            return False
+        conn.executemany(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+            [(int(symbol), shard_id, text, fingerprint) for symbol, text, fingerprint in results]
+        )
+        return True
+
+    def complete(self, shard_id: int, worker: str, results) -> bool:
+        """Store a shard's results and mark it done."""
+        with self._transaction() as conn:
+            if not self._store_results(conn, shard_id, worker, results):
+                return False
+            conn.execute("UPDATE shards SET status = 'done', lease_expires = NULL WHERE id = ?", (shard_id,))
+        return True
+
+    def release(self, shard_id: int, worker: str, results=(), count_attempt: bool = True) -> bool:
+        """Keep a failed shard's partial results and hand it back, or give up after MAX_ATTEMPTS.
+
+        With count_attempt=False the failure is blamed on the worker rather than the shard,
+        so the attempt is given back.
+        """
+        with self._transaction() as conn:
+            if not self._store_results(conn, shard_id, worker, results):
+                return False
+            conn.execute(
+                "UPDATE shards SET status = CASE WHEN ? AND attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "attempts = attempts - ?, worker = NULL, lease_expires = NULL WHERE id = ?",
+                (count_attempt, MAX_ATTEMPTS, 0 if count_attempt else 1, shard_id)
+            )
+        return True
+
+    def resume_point(self, shard_id: int, start_symbol: int) -> int:
+        """Return the first symbol of a shard after the results an earlier attempt already stored."""
+        row = self.conn.execute(
+            "SELECT MAX(symbol_number) FROM results WHERE shard_id = ?", (shard_id,)
+        ).fetchone()
+        return start_symbol if row[0] is None else max(start_symbol, row[0] + 1)
+
+    def remaining(self) -> int:
+        """Number of shards that are not yet done or failed."""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM shards WHERE status IN ('pending', 'leased')"
+        ).fetchone()[0]
+
+    def status(self) -> dict:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM shards GROUP BY status").fetchall())
+
+    def merge(self, output_file: str) -> int:
+        """Write all stored results to one output file in symbol order, plus its fingerprints."""
+        fingerprints = {}
+        count = 0
+        with open(output_file, "w") as f:
+            for symbol_number, ocr_text, fingerprint in self.conn.execute(
+                    "SELECT symbol_number, ocr_text, fingerprint FROM results ORDER BY symbol_number"):
+                f.write("="*40 + "\n")
+                f.write(f"Results for Symbol Number: {symbol_number}\n")
+                f.write("="*40 + "\n")
+                f.write(ocr_text + "\n\n")
+                if fingerprint:
+                    fingerprints[str(symbol_number)] = fingerprint
+                count += 1
+        with open(fingerprint_path(output_file), "w") as f:
+            json.dump(fingerprints, f, indent=1, sort_keys=True)
+        return count
+
+class ShardScraper(TUExamScraper):
+    """Scraper that collects results in memory so the worker can submit them with the shard."""
+
+    def __init__(self, driver, batch_size: int = 1):
+        self.results = {}
+        self.lease_lost = threading.Event()
+        super().__init__(batch_size, output_file=None, driver=driver)
+
+    def start_shard(self, lease_lost: threading.Event):
+        """Clear the previous shard's state before running the next one on the same driver."""
+        self.results = {}
+        self.fingerprints = {}
+        self.pending = []
+        self.lease_lost = lease_lost
+
+    def _should_stop(self) -> bool:
+        return self.lease_lost.is_set()
+
+    def _flush_batch(self):
+        if self.lease_lost.is_set():
+            # The shard belongs to another worker now; don't spend OCR requests on it
+            self.pending = []
+            return
+        super()._flush_batch()
+
+    def _write_to_file(self, symbol_number: str, ocr_text: str):
+        self.results[symbol_number] = ocr_text
+
+def _keep_lease(db_path: str, shard_id: int, worker: str, lease_seconds: float,
+                stop: threading.Event, lost: threading.Event):
+    """Extend a shard lease every third of the lease time until stop is set; set lost if it lapses."""
+    queue = WorkQueue(db_path)
+    try:
+        while not stop.wait(lease_seconds / 3):
+            if not queue.heartbeat(shard_id, worker, lease_seconds):
+                logger.warning(f"Lease on shard {shard_id} was lost.")
+                lost.set()
+                return
+    except Exception as e:
+        logger.error(f"Heartbeat for shard {shard_id} failed: {str(e)}")
+    finally:
+        queue.close()
+
+def run_worker(db_path: str, worker: str, lease_seconds: float = DEFAULT_LEASE_SECONDS, batch_size: int = 1):
+    """Claim and scrape shards until the queue is empty."""
+    # One browser per worker; without one there is no point claiming anything
+    driver = setup_driver()
+    if not driver:
+        logger.error(f"Worker {worker} could not start a browser, exiting without claiming shards.")
+        return
+
+    scraper = ShardScraper(driver, batch_size)
+    queue = WorkQueue(db_path)
+    exam_value = queue.get_meta("exam_value")
+    failures = 0
+    try:
+        while True:
+            shard = queue.claim(worker, lease_seconds)
+            if shard is None:
+                if not queue.remaining():
+                    break
+                # Other workers hold the rest; wait in case one of them dies
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            shard_id, start_symbol, end_symbol = shard
+            logger.info(f"Worker {worker} claimed shard {shard_id} ({start_symbol}-{end_symbol})")
+            # Symbols are scraped in order, so earlier attempts' results form a prefix to skip
+            start_symbol = queue.resume_point(shard_id, start_symbol)
+            if start_symbol > end_symbol:
+                queue.complete(shard_id, worker, [])
+                continue
+            stop, lost = threading.Event(), threading.Event()
+            beat = threading.Thread(target=_keep_lease,
+                                    args=(db_path, shard_id, worker, lease_seconds, stop, lost), daemon=True)
+            beat.start()
+            try:
+                scraper.start_shard(lost)
+                scraper.run(start_symbol, end_symbol, exam_value)
+            finally:
+                stop.set()
+                beat.join()
+
+            if lost.is_set():
+                logger.warning(f"Shard {shard_id} was reassigned before it finished, discarding results.")
+                continue
+
+            results = [(symbol, text, scraper.fingerprints.get(symbol))
+                       for symbol, text in scraper.results.items()]
+            if scraper.last_error:
+                # Without a single result the site or this worker's browser is the likelier
+                # cause, so the shard keeps its attempt
+                logger.warning(f"Shard {shard_id} failed after {len(results)} results, releasing it.")
+                queue.release(shard_id, worker, results, count_attempt=bool(results))
+                failures = 0 if results else failures + 1
+                if failures >= MAX_WORKER_FAILURES:
+                    logger.error(f"Worker {worker} failed {failures} shards in a row, exiting.")
+                    break
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            failures = 0
+            if queue.complete(shard_id, worker, results):
+                logger.info(f"Shard {shard_id} done with {len(results)} results.")
+            else:
+                logger.warning(f"Shard {shard_id} was reassigned before it finished, discarding results.")
+    finally:
+        queue.close()
+        driver.quit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded TU result crawl coordinator")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite work queue path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    init = commands.add_parser("init", help="Split a symbol range into shards")
+    init.add_argument("--start", type=int, required=True)
+    init.add_argument("--end", type=int, required=True)
+    init.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    init.add_argument("--exam", help="Exam option value; prompts from the results page if omitted")
+
+    worker = commands.add_parser("worker", help="Claim and scrape shards")
+    worker.add_argument("--processes", type=int, default=1)
+    worker.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS)
+    worker.add_argument("--batch-size", type=int, default=1)
+
+    commands.add_parser("status", help="Show shard counts by status")
+
+    merge = commands.add_parser("merge", help="Write all results to one output file")
+    merge.add_argument("--output", default="ocr_results.txt")
+
+    args = parser.parse_args()
+
+    if args.command == "init":
+        if args.shard_size <= 0:
+            parser.error("--shard-size must be positive")
+        if args.start > args.end:
+            parser.error("--start must not be greater than --end")
+
+        exam_value = args.exam
+        if exam_value is None:
+            driver = setup_driver()
+            if not driver:
+                return
+            try:
+                exam_value = choose_exam(load_exam_select(driver))
+            finally:
+                driver.quit()
+            if exam_value is None:
+                return
+        queue = WorkQueue(args.db)
+        try:
+            count = queue.create_shards(args.start, args.end, args.shard_size, exam_value)
+            logger.info(f"Created {count} shards in {args.db}")
+        except ValueError as e:
+            logger.error(str(e))
+        finally:
+            queue.close()
+
+    elif args.command == "worker":
+        host = socket.gethostname()
+        processes = [
+            multiprocessing.Process(target=run_worker,
+                                    args=(args.db, f"{host}-{os.getpid()}-{i}", args.lease, args.batch_size))
+            for i in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+    elif args.command == "status":
+        queue = WorkQueue(args.db)
+        for status, count in sorted(queue.status().items()):
+            print(f"{status}: {count}")
+        queue.close()
+
+    elif args.command == "merge":
+        queue = WorkQueue(args.db)
+        count = queue.merge(args.output)
+        logger.info(f"Merged {count} results into {args.output}")
+        queue.close()
+
+if __name__ == "__main__":
+    main()
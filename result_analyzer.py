@@ -1,6 +1,26 @@
 import re
 import os
+import mmap
+import math
+import struct
+import hashlib
 from collections import defaultdict
+from collections.abc import Sequence
+
+# Binary side-file written next to a parsed results file, see save_cache / load_cache
+CACHE_SUFFIX = '.cache'
+CACHE_MAGIC = b'TURC'
+CACHE_VERSION = 2
+# magic, version, source size, source mtime_ns, source sha256, strings, students, subjects
+CACHE_HEADER = struct.Struct('<4sHQQ32sIII')
+# symbol, name, roll no, result (string ids), total marks, obtained marks, first subject, subject count,
+# flags (CACHE_INT_TOTAL / CACHE_INT_OBTAINED when the parser's int 0 default was used)
+CACHE_STUDENT = struct.Struct('<IIIIddIIB')
+CACHE_INT_TOTAL = 1
+CACHE_INT_OBTAINED = 2
+# subject code (string id), full marks, pass marks, obtained marks (NaN when absent)
+CACHE_SUBJECT = struct.Struct('<Iddd')
+CACHE_OFFSET = struct.Struct('<I')
 
 class StudentResult:
     def __init__(self, symbol_number, name, roll_no, subjects, total_marks, obtained_marks, result):
@@ -105,6 +125,169 @@ def parse_results_file(filename):
     
     return students
 
+def _source_key(filename):
+    """Return (size, mtime_ns, sha256) identifying the current contents of a results file."""
+    stat = os.stat(filename)
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return stat.st_size, stat.st_mtime_ns, digest.digest()
+
+def save_cache(filename, students, source_key):
+    """Write the parsed students to a compact binary side-file next to the source.
+    
+    source_key must be taken with _source_key before the source was parsed, so an edit made
+    while parsing leaves the cache stale instead of storing the old parse under the new key.
+    """
+    strings = {}
+    
+    def string_id(value):
+        return strings.setdefault(str(value), len(strings))
+    
+    student_rows = []
+    subject_rows = []
+    for student in students:
+        flags = ((CACHE_INT_TOTAL if isinstance(student.total_marks, int) else 0)
+                 | (CACHE_INT_OBTAINED if isinstance(student.obtained_marks, int) else 0))
+        student_rows.append(CACHE_STUDENT.pack(
+            string_id(student.symbol_number), string_id(student.name),
+            string_id(student.roll_no), string_id(student.result),
+            student.total_marks, student.obtained_marks,
+            len(subject_rows), len(student.subjects), flags
+        ))
+        for subj, marks in student.subjects.items():
+            obtained = marks[2] if marks[2] is not None else math.nan
+            subject_rows.append(CACHE_SUBJECT.pack(string_id(subj), marks[0], marks[1], obtained))
+    
+    encoded = [value.encode('utf-8') for value in strings]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    
+    size, mtime_ns, digest = source_key
+    cache_file = filename + CACHE_SUFFIX
+    tmp_file = cache_file + '.tmp'
+    try:
+        with open(tmp_file, 'wb') as file:
+            file.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, size, mtime_ns, digest,
+                                         len(encoded), len(student_rows), len(subject_rows)))
+            file.write(b''.join(student_rows))
+            file.write(b''.join(subject_rows))
+            file.write(b''.join(CACHE_OFFSET.pack(offset) for offset in offsets))
+            file.write(b''.join(encoded))
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"Could not write cache file: {e}")
+
+class CachedResults(Sequence):
+    """Students in a memory-mapped cache file, unpacked on first access and then kept."""
+    
+    def __init__(self, data, n_strings, n_students, n_subjects):
+        self._view = memoryview(data)
+        self._students_at = CACHE_HEADER.size
+        self._subjects_at = self._students_at + n_students * CACHE_STUDENT.size
+        self._offsets_at = self._subjects_at + n_subjects * CACHE_SUBJECT.size
+        self._strings_at = self._offsets_at + (n_strings + 1) * CACHE_OFFSET.size
+        self._n_strings = n_strings
+        self._offsets = None
+        self._strings = [None] * n_strings
+        self._students = [None] * n_students
+        
+        end = self._strings_at + CACHE_OFFSET.unpack_from(
+            self._view, self._offsets_at + n_strings * CACHE_OFFSET.size)[0]
+        if len(self._view) != end:
+            raise ValueError("Truncated cache file")
+    
+    def _string(self, index):
+        value = self._strings[index]
+        if value is None:
+            if self._offsets is None:
+                # Unpacked on first use so that loading the cache stays constant time
+                self._offsets = struct.unpack_from(f'<{self._n_strings + 1}I', self._view, self._offsets_at)
+            start = self._strings_at + self._offsets[index]
+            end = self._strings_at + self._offsets[index + 1]
+            value = self._strings[index] = str(self._view[start:end], 'utf-8')
+        return value
+    
+    def _unpack(self, index):
+        symbol, name, roll_no, result, total_marks, obtained_marks, first, count, flags = \
+            CACHE_STUDENT.unpack_from(self._view, self._students_at + index * CACHE_STUDENT.size)
+        subjects = {}
+        start = self._subjects_at + first * CACHE_SUBJECT.size
+        for code, full_marks, pass_marks, obtained in CACHE_SUBJECT.iter_unpack(
+                self._view[start:start + count * CACHE_SUBJECT.size]):
+            subjects[self._string(code)] = (full_marks, pass_marks,
+                                            None if math.isnan(obtained) else obtained)
+        if flags & CACHE_INT_TOTAL:
+            total_marks = int(total_marks)
+        if flags & CACHE_INT_OBTAINED:
+            obtained_marks = int(obtained_marks)
+        return StudentResult(self._string(symbol), self._string(name), self._string(roll_no),
+                             subjects, total_marks, obtained_marks, self._string(result))
+    
+    def __len__(self):
+        return len(self._students)
+    
+    def __iter__(self):
+        for index, student in enumerate(self._students):
+            yield student if student is not None else self[index]
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        student = self._students[index]
+        if student is None:
+            student = self._students[index] = self._unpack(index % len(self))
+        return student
+
+def load_cache(filename):
+    """Memory-map the side-file of a results file; return None if missing or stale.
+    
+    Students are unpacked lazily, so the map stays open for the life of the returned sequence.
+    """
+    cache_file = filename + CACHE_SUFFIX
+    try:
+        stat = os.stat(filename)
+        with open(cache_file, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, size, mtime_ns, digest, n_strings, n_students, n_subjects = \
+            CACHE_HEADER.unpack_from(data, 0)
+        # Same size and mtime is trusted without reading the source; a touched file is
+        # only re-parsed if its contents actually changed.
+        touched = mtime_ns != stat.st_mtime_ns
+        if (magic != CACHE_MAGIC or version != CACHE_VERSION or size != stat.st_size
+                or (touched and _source_key(filename)[2] != digest)):
+            # Unmap now so save_cache can replace the stale file
+            data.close()
+            return None
+        students = CachedResults(data, n_strings, n_students, n_subjects)
+        
+        if touched:
+            # Record the new mtime so the next run takes the fast path again
+            with open(cache_file, 'r+b') as file:
+                file.write(CACHE_HEADER.pack(magic, version, size, stat.st_mtime_ns, digest,
+                                             n_strings, n_students, n_subjects))
+        return students
+    except (OSError, ValueError, struct.error):
+        return None
+
+def load_results(filename):
+    """Load students from the binary cache when it is fresh, otherwise parse and cache them."""
+    students = load_cache(filename)
+    if students is not None:
+        print(f"Loaded {len(students)} students from cache.")
+        return students
+    
+    try:
+        source_key = _source_key(filename)
+    except OSError:
+        source_key = None
+    students = parse_results_file(filename)
+    if students and source_key:
+        save_cache(filename, students, source_key)
+    return students
+
 def analyze_results(students):
     analysis = {
         'total_students': len(students),
@@ -195,7 +378,7 @@ def main():
         return
     
     print(f"\nAnalyzing file: {selected_file}")
-    students = parse_results_file(selected_file)
+    students = load_results(selected_file)
     
     if not students:
         print("No student data found in the file.")
@@ -0,0 +1,188 @@
+import os
+
+import pytest
+
+pytest.importorskip("selenium")
+pytest.importorskip("webdriver_manager")
+Image = pytest.importorskip("PIL.Image")
+
+import auto
+from auto import TUExamScraper
+
+
+@pytest.fixture
+def scraper():
+    # Skip __init__, which clears the output file and starts Chrome
+    scraper = TUExamScraper.__new__(TUExamScraper)
+    scraper.pending = []
+    return scraper
+
+
+def test_split_batch_text_recovers_each_symbol(scraper):
+    text = "header\nRESULT MARKER 101\nNAME: A\nROLL NO: 1\nResult MARKER: 102\nNAME: B\n"
+    records = scraper.split_batch_text(text, ["101", "102"])
+    assert records == {"101": "NAME: A\nROLL NO: 1", "102": "NAME: B"}
+
+
+def test_split_batch_text_keeps_recovered_records(scraper):
+    text = "RESULT MARKER 101\nNAME: A\nRESULT MARKER 102\nNAME: B\nRESULT MARKER 999\nNAME: C\n"
+    # The unexpected symbol is ignored
+    assert scraper.split_batch_text(text, ["101", "102", "103"]) == {"101": "NAME: A", "102": "NAME: B"}
+
+
+def test_split_batch_text_drops_record_with_folded_marker(scraper):
+    text = "RESULT MARKER 101\nNAME: A\nRESULT MARKEK 1O2\nNAME: B\nRESULT MARKER 103\nNAME: C\n"
+    # 102's misread marker folded B into 101's text, so neither can be trusted
+    assert scraper.split_batch_text(text, ["101", "102", "103"]) == {"103": "NAME: C"}
+
+
+def test_crop_result_clamps_region_to_screenshot(scraper, tmp_path):
+    path = tmp_path / "shot.png"
+    image = Image.new("RGB", (200, 100), "white")
+    image.paste((0, 0, 0), (10, 60, 50, 100))
+    image.save(path)
+
+    # Table extends below the viewport
+    crop = scraper._crop_result(str(path), (0, 50, 150, 400))
+    assert crop.size == (40, 40)
+
+
+def test_crop_result_ignores_region_outside_screenshot(scraper, tmp_path):
+    path = tmp_path / "shot.png"
+    Image.new("RGB", (200, 100), "white").save(path)
+    crop = scraper._crop_result(str(path), (0, 500, 150, 900))
+    assert crop.size == (200, 100)
+
+
+@pytest.fixture
+def fake_ocr(scraper, tmp_path, monkeypatch):
+    """Stitch into a small file named after the batch and record every OCR request."""
+    requests, saved = [], {}
+
+    def stitch(batch):
+        path = tmp_path / ("sheet_" + "_".join(entry[0] for entry in batch) + ".jpg")
+        path.write_bytes(b"x")
+        return str(path)
+
+    monkeypatch.setattr(scraper, "stitch_screenshots", stitch)
+    monkeypatch.setattr(scraper, "_save_result", lambda symbol, text, fp: saved.__setitem__(symbol, text))
+    return requests, saved
+
+
+def test_ocr_batch_keeps_recovered_records(scraper, fake_ocr, monkeypatch):
+    requests, saved = fake_ocr
+    responses = {
+        # Marker 2 is misread on the first sheet
+        "sheet_0_1_2_3.jpg": "RESULT MARKER 0\nA\nRESULT MARKER 1\nB\nRESULT MARKEK 2\nC\nRESULT MARKER 3\nD",
+    }
+
+    def process_with_ocr(path):
+        requests.append(os.path.basename(path))
+        return responses.get(os.path.basename(path), f"text {os.path.basename(path)}")
+
+    monkeypatch.setattr(scraper, "process_with_ocr", process_with_ocr)
+    scraper._ocr_batch([(str(n), f"shot_{n}.png", None, None) for n in range(4)])
+
+    assert saved["0"] == "A" and saved["3"] == "D"
+    assert saved["1"] == "text shot_1.png" and saved["2"] == "text shot_2.png"
+    # Only the symbols around the lost marker are sent again
+    assert requests == ["sheet_0_1_2_3.jpg", "sheet_1_2.jpg", "shot_1.png", "shot_2.png"]
+
+
+def test_ocr_batch_goes_single_when_no_marker_survives(scraper, fake_ocr, monkeypatch):
+    requests, saved = fake_ocr
+
+    def process_with_ocr(path):
+        requests.append(os.path.basename(path))
+        return "garbled" if "sheet" in path else f"text {path}"
+
+    monkeypatch.setattr(scraper, "process_with_ocr", process_with_ocr)
+    scraper._ocr_batch([(str(n), f"shot_{n}.png", None, None) for n in range(3)])
+
+    assert saved == {str(n): f"text shot_{n}.png" for n in range(3)}
+    # One sheet plus one request per symbol, never more than N + 1
+    assert len(requests) == 4
+
+
+def test_ocr_batch_splits_oversized_sheet_without_request(scraper, tmp_path, monkeypatch):
+    requests, saved = [], {}
+
+    def stitch(batch):
+        path = tmp_path / f"sheet_{len(batch)}.jpg"
+        path.write_bytes(b"x" * (auto.OCR_MAX_BYTES + 1 if len(batch) > 2 else 10))
+        return str(path)
+
+    def process_with_ocr(path):
+        requests.append(path)
+        return "text"
+
+    monkeypatch.setattr(scraper, "stitch_screenshots", stitch)
+    monkeypatch.setattr(scraper, "process_with_ocr", process_with_ocr)
+    monkeypatch.setattr(scraper, "split_batch_text",
+                        lambda text, symbols: {s: s for s in symbols})
+    monkeypatch.setattr(scraper, "_save_result", lambda symbol, text, fp: saved.__setitem__(symbol, text))
+
+    scraper._ocr_batch([(str(n), f"shot_{n}.png", None, None) for n in range(4)])
+
+    assert sorted(saved) == ["0", "1", "2", "3"]
+    assert len(requests) == 2
+
+
+@pytest.fixture
+def recrawler(scraper, tmp_path, monkeypatch):
+    scraper.output_file = str(tmp_path / "ocr_results.txt")
+    scraper.fingerprint_file = str(tmp_path / "ocr_results.fingerprints.json")
+    scraper.recrawl = True
+    scraper.fingerprints = {}
+    scraper.changed, scraper.added, scraper.unchanged = [], [], 0
+    monkeypatch.setattr(scraper, "parse_marksheet", lambda text: None)
+    return scraper
+
+
+def read_output(scraper):
+    with open(scraper.output_file, newline="") as f:
+        return f.read()
+
+
+def test_recrawl_replaces_changed_records_in_place(recrawler):
+    # Written before fingerprints existed
+    recrawler._write_to_file("1", "old one")
+    recrawler._write_to_file("12", "old twelve")
+
+    recrawler._save_result("1", "new one", "fp1")
+    recrawler._save_result("2", "new two", "fp2")
+
+    content = read_output(recrawler)
+    assert "old one" not in content
+    assert content.count("Results for Symbol Number: 1\n") == 1
+    # The replaced record keeps its place ahead of 12; the new one is appended
+    assert content.index("new one") < content.index("old twelve") < content.index("new two")
+    assert recrawler.changed == ["1"]
+    assert recrawler.added == ["2"]
+    assert recrawler.fingerprints == {"1": "fp1", "2": "fp2"}
+
+
+def test_recrawl_identical_text_is_unchanged(recrawler):
+    recrawler._write_to_file("1", "NAME: A\r\nResult: P\r\n")
+    recrawler._write_to_file("2", "NAME: B")
+    before = read_output(recrawler)
+
+    recrawler._save_result("1", "NAME: A\r\nResult: P\r\n", "fp1")
+
+    assert read_output(recrawler) == before
+    assert recrawler.changed == [] and recrawler.added == []
+    assert recrawler.unchanged == 1
+    assert recrawler.fingerprints == {"1": "fp1"}
+
+
+def test_fingerprints_saved_once_per_flush(recrawler, monkeypatch):
+    saves = []
+    monkeypatch.setattr(recrawler, "_save_fingerprints", lambda: saves.append(dict(recrawler.fingerprints)))
+    monkeypatch.setattr(recrawler, "_ocr_batch", lambda batch: [
+        recrawler._save_result(symbol, f"text {symbol}", f"fp{symbol}") for symbol, _, _, _ in batch])
+
+    recrawler.pending = [(str(n), f"shot_{n}.png", None, None) for n in range(3)]
+    recrawler._flush_batch()
+    recrawler._flush_batch()
+
+    assert saves == [{"0": "fp0", "1": "fp1", "2": "fp2"}]
@@ -0,0 +1,198 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("selenium")
+pytest.importorskip("webdriver_manager")
+pytest.importorskip("PIL")
+
+import crawl_coordinator
+from crawl_coordinator import MAX_ATTEMPTS, ShardScraper, WorkQueue, run_worker
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    yield queue
+    queue.close()
+
+
+def test_create_shards_splits_range(queue):
+    assert queue.create_shards(1, 12, 5, "EXAM") == 3
+    assert queue.get_meta("exam_value") == "EXAM"
+    assert queue.claim("w1", 60) == (1, 1, 5)
+    assert queue.claim("w2", 60) == (2, 6, 10)
+    assert queue.claim("w3", 60) == (3, 11, 12)
+    assert queue.claim("w4", 60) is None
+
+
+@pytest.mark.parametrize("start, end, size", [(1, 10, 0), (1, 10, -5), (10, 1, 5)])
+def test_create_shards_rejects_bad_range(queue, start, end, size):
+    with pytest.raises(ValueError):
+        queue.create_shards(start, end, size, "EXAM")
+    # The rejected init leaves the queue usable
+    assert queue.create_shards(1, 10, 5, "EXAM") == 2
+
+
+def test_create_shards_refuses_second_crawl(queue):
+    queue.create_shards(1, 10, 5, "EXAM")
+    with pytest.raises(ValueError):
+        queue.create_shards(1, 10, 5, "EXAM")
+
+
+def test_expired_lease_is_reassigned(queue):
+    queue.create_shards(1, 10, 5, "EXAM")
+    shard = queue.claim("dead", 0.01)
+    time.sleep(0.05)
+
+    assert queue.claim("alive", 60) == shard
+    assert not queue.heartbeat(shard[0], "dead", 60)
+    assert not queue.complete(shard[0], "dead", [("1", "stale", None)])
+    assert queue.complete(shard[0], "alive", [("1", "fresh", "fp")])
+    assert queue.status() == {"done": 1, "pending": 1}
+
+
+def test_expired_shard_fails_after_max_attempts(queue):
+    queue.create_shards(1, 10, 5, "EXAM")
+    for attempt in range(MAX_ATTEMPTS):
+        assert queue.claim(f"dead{attempt}", 0.01)[0] == 1
+        time.sleep(0.05)
+
+    # The next claim gives up on shard 1 instead of handing it out again
+    assert queue.claim("alive", 60)[0] == 2
+    assert queue.status() == {"failed": 1, "leased": 1}
+
+
+def test_release_keeps_partial_results(queue):
+    queue.create_shards(1, 10, 5, "EXAM")
+    shard_id, start_symbol, _ = queue.claim("w1", 60)
+    assert queue.release(shard_id, "w1", [("1", "one", None), ("2", "two", None)])
+    assert queue.status() == {"pending": 2}
+
+    assert queue.claim("w2", 60)[0] == shard_id
+    assert queue.resume_point(shard_id, start_symbol) == 3
+
+
+def test_release_gives_up_after_max_attempts(queue):
+    queue.create_shards(1, 5, 5, "EXAM")
+    for attempt in range(MAX_ATTEMPTS):
+        shard_id = queue.claim("w1", 60)[0]
+        queue.release(shard_id, "w1")
+    assert queue.status() == {"failed": 1}
+    assert queue.remaining() == 0
+
+
+def test_merge_writes_results_in_symbol_order(queue, tmp_path):
+    queue.create_shards(1, 10, 5, "EXAM")
+    low = queue.claim("w1", 60)[0]
+    high = queue.claim("w2", 60)[0]
+    # Shards finish out of order
+    queue.complete(high, "w2", [("7", "seven", "fp7")])
+    queue.complete(low, "w1", [("3", "three", None)])
+
+    output = tmp_path / "merged.txt"
+    assert queue.merge(str(output)) == 2
+    content = output.read_text()
+    assert content.index("Symbol Number: 3") < content.index("Symbol Number: 7")
+    assert (tmp_path / "merged.fingerprints.json").read_text().count("fp7") == 1
+
+
+def test_release_without_counting_keeps_attempts(queue):
+    queue.create_shards(1, 5, 5, "EXAM")
+    for _ in range(MAX_ATTEMPTS + 2):
+        shard_id = queue.claim("w1", 60)[0]
+        queue.release(shard_id, "w1", count_attempt=False)
+    assert queue.status() == {"pending": 1}
+    attempts = queue.conn.execute("SELECT attempts FROM shards").fetchone()[0]
+    assert attempts == 0
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_calls = 0
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(crawl_coordinator, "POLL_INTERVAL", 0)
+    path = str(tmp_path / "queue.db")
+    queue = WorkQueue(path)
+    queue.create_shards(1, 100, 10, "EXAM")
+    queue.close()
+    return path
+
+
+def shard_status(db):
+    queue = WorkQueue(db)
+    try:
+        return queue.status()
+    finally:
+        queue.close()
+
+
+def test_worker_without_browser_claims_nothing(db, monkeypatch):
+    monkeypatch.setattr(crawl_coordinator, "setup_driver", lambda: None)
+    run_worker(db, "broken")
+    assert shard_status(db) == {"pending": 10}
+
+
+def test_broken_worker_does_not_fail_shards(db, monkeypatch):
+    driver = FakeDriver()
+    monkeypatch.setattr(crawl_coordinator, "setup_driver", lambda: driver)
+    runs = []
+
+    def run(self, start_symbol, end_symbol, exam_value=None):
+        runs.append(start_symbol)
+        self.last_error = Exception("page timeout")
+
+    monkeypatch.setattr(ShardScraper, "run", run)
+    run_worker(db, "broken")
+
+    # The worker gives up on itself; every shard is still available to healthy workers
+    assert len(runs) == crawl_coordinator.MAX_WORKER_FAILURES
+    assert shard_status(db) == {"pending": 10}
+    assert driver.quit_calls == 1
+
+
+def test_worker_reuses_one_browser(db, monkeypatch):
+    drivers = []
+    monkeypatch.setattr(crawl_coordinator, "setup_driver", lambda: drivers.append(FakeDriver()) or drivers[-1])
+
+    def run(self, start_symbol, end_symbol, exam_value=None):
+        assert exam_value == "EXAM"
+        self.last_error = None
+        self.results = {str(start_symbol): f"text {start_symbol}"}
+
+    monkeypatch.setattr(ShardScraper, "run", run)
+    run_worker(db, "healthy")
+
+    assert len(drivers) == 1 and drivers[0].quit_calls == 1
+    assert shard_status(db) == {"done": 10}
+
+
+def test_shard_scraper_leaves_output_files_alone(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "ocr_results.txt").write_text("kept")
+    scraper = ShardScraper(FakeDriver())
+    assert (tmp_path / "ocr_results.txt").read_text() == "kept"
+    assert scraper.fingerprint_file is None
+    scraper._save_fingerprints()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["ocr_results.txt"]
+
+
+def test_shard_scraper_stops_when_lease_is_lost():
+    scraper = ShardScraper(FakeDriver())
+    lost = threading.Event()
+    scraper.start_shard(lost)
+    assert not scraper._should_stop()
+
+    lost.set()
+    scraper.pending = [("1", "shot_1.png", None, None)]
+    scraper._flush_batch()
+    assert scraper._should_stop()
+    # Queued screenshots of a lost shard are dropped instead of OCRed
+    assert scraper.pending == [] and scraper.results == {}
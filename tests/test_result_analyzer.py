@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+import result_analyzer
+from result_analyzer import load_cache, load_results, parse_results_file, save_cache
+
+
+RECORD = (
+    "NAME: Ram Bahadur\n"
+    "ROLL NO: 55\n"
+    "PHY 101: Mechanics 100 35 60\n"
+    "CHM 102: Organic 100 35\n"
+    "Total Marks: 200\n"
+    "Obtained Marks: 60\n"
+    "Result: F\n"
+)
+
+
+def write_results(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for symbol_number, text in records:
+            f.write("=" * 40 + "\n")
+            f.write(f"Results for Symbol Number: {symbol_number}\n")
+            f.write("=" * 40 + "\n")
+            f.write(text + "\n\n")
+
+
+def as_dicts(students):
+    return [vars(student) for student in students]
+
+
+@pytest.fixture
+def results_file(tmp_path):
+    path = str(tmp_path / "ocr_results.txt")
+    write_results(path, [("1", RECORD), ("2", RECORD.replace("Ram", "Sītā").replace("Result: F", "Result: P"))])
+    return path
+
+
+def test_cache_round_trip(results_file):
+    students = load_results(results_file)
+    assert os.path.exists(results_file + result_analyzer.CACHE_SUFFIX)
+
+    cached = load_cache(results_file)
+    assert as_dicts(cached) == as_dicts(students)
+    assert cached[1].name == "Sītā Bahadur"
+    assert cached[0].subjects["CHM 102: Organic"] == (100.0, 35.0, None)
+
+
+def test_cache_is_stale_after_edit(results_file):
+    load_results(results_file)
+    with open(results_file, "a", encoding="utf-8") as f:
+        f.write("extra\n")
+    assert load_cache(results_file) is None
+
+
+def test_touched_file_hashes_once(results_file, monkeypatch):
+    load_results(results_file)
+    stat = os.stat(results_file)
+    os.utime(results_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert load_cache(results_file) is not None
+
+    # The refreshed header lets the next load skip hashing the source
+    def fail(filename):
+        raise AssertionError("source was hashed again")
+    monkeypatch.setattr(result_analyzer, "_source_key", fail)
+    assert load_cache(results_file) is not None
+
+
+def test_cache_uses_key_taken_before_parse(results_file):
+    source_key = result_analyzer._source_key(results_file)
+    students = parse_results_file(results_file)
+    # The source changes after the key was taken but before the cache is written
+    write_results(results_file, [("1", RECORD)] * 3)
+    save_cache(results_file, students, source_key)
+
+    assert load_cache(results_file) is None
+    assert len(load_results(results_file)) == 3
+
+
+def test_cache_keeps_int_default_marks(tmp_path):
+    path = str(tmp_path / "ocr_results.txt")
+    # No Total/Obtained lines, so the parser falls back to the int 0
+    write_results(path, [("1", "NAME: A\nPHY 101: Mechanics 100 35 60\nResult: P\n")])
+    parsed = load_results(path)
+    cached = load_cache(path)
+    assert type(parsed[0].total_marks) is int
+    assert type(cached[0].total_marks) is int and type(cached[0].obtained_marks) is int
+
+
+def test_cached_results_behave_like_a_list(results_file):
+    students = load_results(results_file)
+    cached = load_cache(results_file)
+    assert len(cached) == 2
+    assert cached[-1].name == students[-1].name
+    assert [s.name for s in cached[:1]] == ["Ram Bahadur"]
+    # Records are built once and then reused
+    assert cached[0] is cached[0]
+    with pytest.raises(IndexError):
+        cached[2]
+
+
+def test_truncated_cache_is_ignored(results_file):
+    load_results(results_file)
+    cache_file = results_file + result_analyzer.CACHE_SUFFIX
+    with open(cache_file, "r+b") as f:
+        f.truncate(os.path.getsize(cache_file) - 3)
+    assert load_cache(results_file) is None